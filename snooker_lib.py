@@ -0,0 +1,202 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import altair as alt
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+threshold_values = {
+    "Yellow": 0.111,
+    "Green": 0.118,
+    "Brown": 0.105,
+    "Blue": 0.308,
+    "Pink": 0.118,
+    "Black": 0.357,
+    "Baulk": 0.318
+}
+
+color_list = list(threshold_values.keys())
+
+color_mapping = {
+    "Yellow": "#FFFF00",
+    "Green": "#008000",
+    "Brown": "#8B4513",
+    "Blue": "#0000FF",
+    "Pink": "#FFC0CB",
+    "Black": "#000000",
+    "Baulk": "#7FFFD4"
+}
+
+preset_days = {
+    "Last 3 Months": 90,
+    "Last 6 Months": 180,
+    "Last Year": 365,
+    "Last 2 Years": 730
+}
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def load_workbook(file_id, _uploaded_file):
+    excel = pd.ExcelFile(BytesIO(_uploaded_file.getvalue()), engine="calamine")
+    game_df = pd.read_excel(excel, sheet_name="Game view", usecols=["Player 1", "Player 2", "Date", "Total Frames", *color_list])
+    player_keys_df = pd.read_excel(excel, sheet_name="PlayerKeys", usecols=["ID", "Name"])
+
+    player_keys_df = player_keys_df.drop_duplicates("ID", keep="last")
+    key_index = pd.Index(player_keys_df["ID"])
+    key_names = player_keys_df["Name"]
+    key_rows = [key_index.get_indexer(game_df[col]) for col in ("Player 1", "Player 2")]
+    seen_rows = np.unique(np.concatenate(key_rows))
+    name_dtype = pd.CategoricalDtype(pd.Index(key_names.iloc[seen_rows[seen_rows >= 0]].dropna().unique()).sort_values())
+    player_list = name_dtype.categories.tolist()
+    # PlayerKeys row -> name code; the trailing -1 catches IDs missing from PlayerKeys (row -1)
+    code_lut = np.append(name_dtype.categories.get_indexer(key_names), -1)
+    game_df["Player 1 Name"] = pd.Categorical.from_codes(code_lut[key_rows[0]], dtype=name_dtype)
+    game_df["Player 2 Name"] = pd.Categorical.from_codes(code_lut[key_rows[1]], dtype=name_dtype)
+    game_df = game_df.drop(columns=["Player 1", "Player 2"])
+    game_df["Date"] = pd.to_datetime(game_df["Date"], format="%Y%m%d", cache=True)
+    # Undated games would sort to the end and leak into every open-ended date slice
+    game_df = game_df.dropna(subset=["Date"])
+    game_df["Total Frames"] = pd.to_numeric(game_df["Total Frames"], errors='coerce').fillna(0).astype(np.int32)
+    for col in color_list:
+        game_df[col] = pd.to_numeric(game_df[col], errors='coerce').fillna(0).astype(np.float32)
+    # Colour columns hold frame-weighted proportions from here on, so stats are plain column sums
+    game_df[color_list] = game_df[color_list].to_numpy() * game_df["Total Frames"].to_numpy(dtype=np.float32)[:, None]
+    game_df = game_df.sort_values("Date", kind="stable", ignore_index=True)
+
+    # Inverted index: player name -> row positions of their games, which are in date order after the sort
+    p1 = game_df["Player 1 Name"].cat.codes.to_numpy()
+    p2 = game_df["Player 2 Name"].cat.codes.to_numpy()
+    codes = np.concatenate([p1, np.where(p2 == p1, -1, p2)])
+    positions = np.tile(np.arange(len(game_df)), 2)
+    order = np.lexsort((positions, codes))
+    bounds = np.searchsorted(codes[order], np.arange(len(player_list) + 1))
+    player_rows = {name: positions[order[bounds[i]:bounds[i + 1]]] for i, name in enumerate(player_list)}
+    return game_df, player_list, player_rows
+
+def get_player_stats(df, player_rows, player_name, start_date=None, end_date=None):
+    rows = player_rows[player_name]
+    dates = df["Date"].to_numpy()[rows]
+    lo = 0 if start_date is None else np.searchsorted(dates, np.datetime64(start_date), side="left")
+    hi = len(rows) if end_date is None else np.searchsorted(dates, np.datetime64(end_date), side="right")
+    rows = rows[lo:hi]
+    # Per-column to_numpy() returns views of the cached frame (df[color_list] would copy); only the player's rows are gathered
+    weighted_sums = np.array([df[col].to_numpy()[rows].sum() for col in color_list])
+    total_frames = int(df["Total Frames"].to_numpy()[rows].sum())
+    weighted_avgs = weighted_sums / total_frames if total_frames > 0 else np.zeros(len(color_list), dtype=np.float32)
+    avg_colors = pd.DataFrame({"Ball": color_list, "Average Proportion": weighted_avgs})
+    return avg_colors, len(rows), total_frames
+
+def get_all_player_stats(df, start_date):
+    lo = np.searchsorted(df["Date"].to_numpy(), np.datetime64(start_date), side="left")
+    players = df["Player 1 Name"].cat.categories
+    p1 = df["Player 1 Name"].cat.codes.to_numpy()[lo:]
+    p2 = df["Player 2 Name"].cat.codes.to_numpy()[lo:]
+    # Each game counts towards both players (once for a self-match); +1 moves unknown players (-1) into bin 0
+    codes = np.concatenate([p1, np.where(p2 == p1, -1, p2)]) + 1
+    totals = [np.bincount(codes, weights=np.tile(df[col].to_numpy()[lo:], 2), minlength=len(players) + 1)[1:]
+              for col in color_list + ["Total Frames"]]
+    weighted_sums = np.column_stack(totals[:-1])
+    total_frames = totals[-1][:, None]
+    weighted_avgs = np.divide(weighted_sums, total_frames, out=np.zeros_like(weighted_sums), where=total_frames > 0)
+    return pd.DataFrame(weighted_avgs, index=players, columns=color_list)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def compute_stats(_game_df, _player_rows, file_id, player_name, start_date, end_date):
+    return get_player_stats(_game_df, _player_rows, player_name, start_date, end_date)
+
+@st.cache_resource
+def get_http_session():
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_http_executor():
+    return ThreadPoolExecutor(max_workers=8)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_tournament_list():
+    from selectolax.lexbor import LexborHTMLParser
+
+    url = "https://www.snooker.org/res/index.asp?template=2"
+    response = get_http_session().get(url, timeout=10)
+    response.raise_for_status()
+    tree = LexborHTMLParser(response.content, encoding=True)
+    tournaments = []
+    for row in tree.css("tr.gradeA"):
+        name_link = row.css_first("td.name a")
+        date_cell = row.css_first("td.date")
+        if name_link:
+            event_name = name_link.text().strip()
+            event_id = name_link.attributes["href"].split("event=")[-1]
+            event_date = date_cell.text().strip() if date_cell else ""
+            tournaments.append({"label": f"{event_name} ({event_date})", "id": event_id})
+    return tournaments
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def fetch_event_matchups(event_id):
+    from selectolax.lexbor import LexborHTMLParser
+
+    url = f"https://www.snooker.org/res/index.asp?event={event_id}"
+    response = get_http_session().get(url, timeout=10)
+    response.raise_for_status()
+    tree = LexborHTMLParser(response.content, encoding=True)
+    matchups = []
+    for row in tree.css("tr.oneonone"):
+        round_class = next((cls for cls in (row.attributes.get("class") or "").split() if cls.startswith("round")), None)
+        players = row.css("td.player")
+        if len(players) >= 2:
+            p1_tag = players[0].css_first("a")
+            p2_tag = players[1].css_first("a")
+            if p1_tag and p2_tag:
+                player1 = p1_tag.attributes["title"].split(",")[0].strip()
+                player2 = p2_tag.attributes["title"].split(",")[0].strip()
+                matchups.append((round_class, player1, player2))
+    return matchups
+
+def get_upcoming_matchups_from_event(event_id, selected_round=None):
+    # The event page is cached once per event; the round filter runs on the cached rows
+    return [(player1, player2) for round_class, player1, player2 in fetch_event_matchups(event_id)
+            if not selected_round or round_class == selected_round]
+
+def create_chart(data, player_name, game_count, frame_count, thresholds):
+    chart_data = data.assign(Threshold=thresholds.astype(np.float32))
+    diff = ((chart_data["Average Proportion"] - chart_data["Threshold"]) / chart_data["Threshold"]).to_numpy() * 100
+    ball_colors = np.array([color_mapping.get(ball, "#000000") for ball in chart_data["Ball"]])
+    chart_data["Label"] = np.char.mod("%+.1f%%", diff)
+    chart_data["Label Color"] = np.where(diff >= 0, "green", "red")
+    chart_data["Bar Color"] = np.where(diff < 0, "#D3D3D3", ball_colors)
+
+    base = alt.Chart().encode(x=alt.X("Ball", sort=None))
+    bars = base.mark_bar().encode(y="Average Proportion", color=alt.Color("Bar Color:N", scale=None, legend=None), tooltip=["Ball", alt.Tooltip("Average Proportion", format=".3f"), alt.Tooltip("Threshold", format=".3f"), "Label"])
+    rules = base.mark_rule(color="red", strokeDash=[4, 2]).encode(y="Threshold")
+    labels = base.mark_text(dy=-10, fontSize=13).encode(y="Average Proportion", text="Label", color=alt.Color("Label Color", scale=None))
+
+    return alt.layer(bars, rules, labels, data=chart_data).properties(title=f"{player_name} ({game_count} games / {frame_count} frames)", width=300, height=400)
+
+@st.cache_data(show_spinner=False)
+def process_names(names):
+    from rapidfuzz import utils
+
+    return [utils.default_process(name) for name in names]
+
+@st.cache_data(show_spinner=False)
+def fuzzy_match_names(names, name_list, threshold=80):
+    from rapidfuzz import fuzz, process, utils
+
+    known_names = set(name_list)
+    matches = [name if name in known_names else None for name in names]
+    misses = [i for i, name in enumerate(names) if name not in known_names]
+    if not misses:
+        return matches
+    queries = [utils.default_process(names[i]) for i in misses]
+    scores = process.cdist(queries, process_names(name_list), scorer=fuzz.WRatio, processor=None,
+                           score_cutoff=threshold, dtype=np.uint8, workers=-1)
+    best_idx = scores.argmax(axis=1)
+    best_score = scores.max(axis=1)
+    for i, idx, score in zip(misses, best_idx, best_score):
+        matches[i] = name_list[idx] if score >= threshold else None
+    return matches
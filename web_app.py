@@ -1,10 +1,21 @@
 import streamlit as st
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
 import pandas as pd
-import altair as alt
-from datetime import datetime, timedelta
-import requests
-from bs4 import BeautifulSoup
-from fuzzywuzzy import process
+from snooker_lib import (
+    color_list,
+    compute_stats,
+    create_chart,
+    fetch_event_matchups,
+    fetch_tournament_list,
+    fuzzy_match_names,
+    get_all_player_stats,
+    get_http_executor,
+    get_upcoming_matchups_from_event,
+    load_workbook,
+    preset_days,
+    threshold_values,
+)
 
 st.set_page_config(page_title="Snooker Game Visualizer", layout="wide")
 st.title("Snooker Game Data Visualization")
@@ -13,6 +24,10 @@ if 'uploaded_file' not in st.session_state:
     st.session_state.uploaded_file = None
 if 'matchup_results' not in st.session_state:
     st.session_state.matchup_results = None
+if 'tournaments' not in st.session_state:
+    st.session_state.tournaments = None
+if 'prefetched_event' not in st.session_state:
+    st.session_state.prefetched_event = None
 
 if st.session_state.uploaded_file:
     uploaded_file = st.session_state.uploaded_file
@@ -21,35 +36,22 @@ else:
     if uploaded_file:
         st.session_state.uploaded_file = uploaded_file
 
-if uploaded_file:
-    excel = pd.ExcelFile(uploaded_file)
-    game_df = pd.read_excel(excel, sheet_name="Game view")
-    player_keys_df = pd.read_excel(excel, sheet_name="PlayerKeys")
-
-    id_to_name = player_keys_df.set_index("ID")["Name"].to_dict()
-    game_df["Player 1 Name"] = game_df["Player 1"].map(id_to_name)
-    game_df["Player 2 Name"] = game_df["Player 2"].map(id_to_name)
-    game_df["Date"] = pd.to_datetime(game_df["Date"], format="%Y%m%d")
-
-    threshold_values = {
-        "Yellow": 0.111,
-        "Green": 0.118,
-        "Brown": 0.105,
-        "Blue": 0.308,
-        "Pink": 0.118,
-        "Black": 0.357,
-        "Baulk": 0.318
-    }
-
-    color_list = list(threshold_values.keys())
+@st.fragment
+def player_comparison(game_df, player_list, player_rows, file_id):
+    """Threshold sliders and player charts, rerun on their own so dragging a slider skips the tournament section."""
+    # The loader drops undated games and sorts by date, so the range ends are the first and last rows
+    first_date, last_date = game_df["Date"].iloc[0], game_df["Date"].iloc[-1]
+
     min_thresholds = {}
-    st.sidebar.header("Minimum Value Thresholds")
-    for color in color_list:
-        min_thresholds[color] = st.sidebar.slider(
-            f"{color}", 0.0, 1.0, threshold_values.get(color, 0.0), 0.01
-        )
+    with st.expander("Minimum Value Thresholds", expanded=True):
+        for color, col in zip(color_list, st.columns(len(color_list))):
+            with col:
+                min_thresholds[color] = st.slider(
+                    f"{color}", 0.0, 1.0, threshold_values.get(color, 0.0), 0.01
+                )
+    thresholds = np.array([min_thresholds[color] for color in color_list])
+    st.session_state.thresholds = thresholds
 
-    player_list = sorted(set(game_df["Player 1 Name"].dropna()).union(game_df["Player 2 Name"].dropna()))
     col1, col_date, col_toggle, col2 = st.columns([1.5, 2, 1, 1.5])
 
     with col1:
@@ -60,119 +62,43 @@ if uploaded_file:
         use_presets = st.toggle("Use Preset Range", value=True)
     with col_date:
         if use_presets:
-            preset = st.selectbox("Preset Range", ["Last 3 Months", "Last 6 Months", "Last Year", "Last 2 Years", "All Time"])
-            today = datetime.today()
-            if preset == "Last 3 Months":
-                start_date = today - timedelta(days=90)
-            elif preset == "Last 6 Months":
-                start_date = today - timedelta(days=180)
-            elif preset == "Last Year":
-                start_date = today - timedelta(days=365)
-            elif preset == "Last 2 Years":
-                start_date = today - timedelta(days=730)
-            else:
-                start_date = game_df["Date"].min()
+            preset = st.selectbox("Preset Range", list(preset_days) + ["All Time"])
+            today = pd.Timestamp.today().normalize()
+            start_date = today - pd.Timedelta(days=preset_days[preset]) if preset in preset_days else first_date
             end_date = today
         else:
-            date_range = st.date_input("Select Date Range", [game_df["Date"].min(), game_df["Date"].max()], key="date_range")
+            date_range = st.date_input("Select Date Range", [first_date, last_date], key="date_range")
             start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
 
-    filtered_df = game_df[(game_df["Date"] >= start_date) & (game_df["Date"] <= end_date)]
-
-    def get_player_stats(df, player_name):
-        player_games = df[(df["Player 1 Name"] == player_name) | (df["Player 2 Name"] == player_name)].copy()
-        player_games["Total Frames"] = pd.to_numeric(player_games["Total Frames"], errors='coerce').fillna(0)
-        for col in color_list:
-            player_games[col] = pd.to_numeric(player_games[col], errors='coerce').fillna(0)
-            player_games[col] *= player_games["Total Frames"]
-        weighted_sums = player_games[color_list].sum()
-        total_frames = int(player_games["Total Frames"].sum())
-        weighted_avgs = weighted_sums / total_frames if total_frames > 0 else pd.Series([0]*len(color_list), index=color_list)
-        avg_colors = weighted_avgs.reset_index()
-        avg_colors.columns = ["Ball", "Average Proportion"]
-        return avg_colors, len(player_games), total_frames
-
-    def create_chart(data, player_name, game_count, frame_count):
-        color_mapping = {
-            "Yellow": "#FFFF00",
-            "Green": "#008000",
-            "Brown": "#8B4513",
-            "Blue": "#0000FF",
-            "Pink": "#FFC0CB",
-            "Black": "#000000",
-            "Baulk": "#7FFFD4"
-        }
-        thresholds_df = pd.DataFrame({"Ball": list(min_thresholds.keys()), "Threshold": list(min_thresholds.values())})
-        chart_data = data.merge(thresholds_df, on="Ball")
-        chart_data["Percentage Diff"] = ((chart_data["Average Proportion"] - chart_data["Threshold"]) / chart_data["Threshold"]) * 100
-        chart_data["Label"] = chart_data["Percentage Diff"].apply(lambda x: f"{x:+.1f}%")
-        chart_data["Label Color"] = chart_data["Percentage Diff"].apply(lambda x: "green" if x >= 0 else "red")
-        chart_data["Bar Color"] = chart_data.apply(
-            lambda row: "#D3D3D3" if row["Percentage Diff"] < 0 else color_mapping.get(row["Ball"], "#000000"), axis=1)
-
-        base = alt.Chart(chart_data).encode(x=alt.X("Ball", sort=None))
-        bars = base.mark_bar().encode(y="Average Proportion", color=alt.Color("Bar Color:N", scale=None, legend=None), tooltip=["Ball", "Average Proportion", "Threshold", "Label"])
-        rules = alt.Chart(chart_data).mark_rule(color="red", strokeDash=[4, 2]).encode(x="Ball", y="Threshold")
-        labels = base.mark_text(dy=-10, fontSize=13).encode(y="Average Proportion", text="Label", color=alt.Color("Label Color", scale=None))
-
-        return (bars + rules + labels).properties(title=f"{player_name} ({game_count} games / {frame_count} frames)", width=300, height=400)
-
-    def fuzzy_match_name(name, name_list, threshold=80):
-        match, score = process.extractOne(name, name_list)
-        return match if score >= threshold else None
-
-    def fetch_tournament_list():
-        url = "https://www.snooker.org/res/index.asp?template=2"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.content, "html.parser")
-        tournaments = []
-        rows = soup.find_all("tr", class_="gradeA")
-        for row in rows:
-            name_cell = row.find("td", class_="name")
-            date_cell = row.find("td", class_="date")
-            if name_cell and name_cell.a:
-                event_name = name_cell.a.text.strip()
-                event_id = name_cell.a["href"].split("event=")[-1]
-                event_date = date_cell.text.strip() if date_cell else ""
-                tournaments.append({"label": f"{event_name} ({event_date})", "id": event_id})
-        return tournaments
-
-    def get_upcoming_matchups_from_event(event_id, selected_round=None):
-        url = f"https://www.snooker.org/res/index.asp?event={event_id}"
-        try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            matchups = []
-            for row in soup.find_all("tr", class_="oneonone"):
-                round_class = next((cls for cls in row.get("class", []) if cls.startswith("round")), None)
-                if selected_round and round_class != selected_round:
-                    continue
-                players = row.find_all("td", class_="player")
-                if len(players) >= 2:
-                    p1_tag = players[0].find("a")
-                    p2_tag = players[1].find("a")
-                    if p1_tag and p2_tag:
-                        player1 = p1_tag["title"].split(",")[0].strip()
-                        player2 = p2_tag["title"].split(",")[0].strip()
-                        matchups.append((player1, player2))
-            return matchups
-        except Exception as e:
-            st.error(f"Error scraping matchups: {e}")
-            return []
-
-    stats_a, games_a, frames_a = get_player_stats(filtered_df, player_a)
-    stats_b, games_b, frames_b = get_player_stats(filtered_df, player_b)
+    stats_a, games_a, frames_a = compute_stats(game_df, player_rows, file_id, player_a, start_date, end_date)
+    stats_b, games_b, frames_b = compute_stats(game_df, player_rows, file_id, player_b, start_date, end_date)
     col_v1, col_v2 = st.columns(2)
     with col_v1:
-        st.altair_chart(create_chart(stats_a, player_a, games_a, frames_a), use_container_width=True)
+        st.altair_chart(create_chart(stats_a, player_a, games_a, frames_a, thresholds), use_container_width=True)
     with col_v2:
-        st.altair_chart(create_chart(stats_b, player_b, games_b, frames_b), use_container_width=True)
+        st.altair_chart(create_chart(stats_b, player_b, games_b, frames_b, thresholds), use_container_width=True)
+
+
+if uploaded_file:
+    game_df, player_list, player_rows = load_workbook(uploaded_file.file_id, uploaded_file)
+    if not st.session_state.tournaments:
+        tournaments_future = get_http_executor().submit(fetch_tournament_list)
+
+    player_comparison(game_df, player_list, player_rows, uploaded_file.file_id)
 
     st.divider()
     st.markdown("## ✅ Matchups with Positive Bias (Both Players)")
 
     st.sidebar.markdown("## 🏆 Select a Tournament")
-    tournaments = fetch_tournament_list()
+    if not st.session_state.tournaments:
+        with st.spinner("Fetching tournaments…"):
+            try:
+                st.session_state.tournaments = tournaments_future.result(timeout=15)
+            except FutureTimeoutError:
+                st.error("Timed out fetching tournaments from snooker.org")
+            except Exception as e:
+                st.error(f"Error fetching tournaments: {e}")
+    tournaments = st.session_state.tournaments
 
     if tournaments:
         selected_label = st.sidebar.selectbox("Choose a tournament to analyze", [t["label"] for t in tournaments])
@@ -180,26 +106,35 @@ if uploaded_file:
         round_options = [f"round{i}" for i in range(1, 11)]
         selected_round = st.sidebar.selectbox("Select Round (optional)", ["All"] + round_options)
         selected_round = None if selected_round == "All" else selected_round
+        # Warm the matchup cache in the background so "Fetch Matchups" rarely waits on the network;
+        # once per selected event, so reruns don't pile up on the shared pool
+        if selected_event != st.session_state.prefetched_event:
+            st.session_state.prefetched_event = selected_event
+            get_http_executor().submit(fetch_event_matchups, selected_event)
 
         st.sidebar.markdown("### 🔍 Analyze Matchups")
         if st.sidebar.button("Fetch Matchups"):
-            one_year_df = game_df[(game_df["Date"] >= datetime.today() - timedelta(days=365))]
-            matchups = get_upcoming_matchups_from_event(selected_event, selected_round)
-            results = []
-            for p1, p2 in matchups:
-                match_p1 = fuzzy_match_name(p1, player_list)
-                match_p2 = fuzzy_match_name(p2, player_list)
-                if match_p1 and match_p2:
-                    stats_a, _, _ = get_player_stats(one_year_df, match_p1)
-                    stats_b, _, _ = get_player_stats(one_year_df, match_p2)
-                    df_thresh = pd.DataFrame.from_dict(min_thresholds, orient="index", columns=["Threshold"]).reset_index().rename(columns={"index": "Ball"})
-                    merged_a = stats_a.merge(df_thresh, on="Ball")
-                    merged_b = stats_b.merge(df_thresh, on="Ball")
-                    a_bias = merged_a[merged_a["Average Proportion"] > merged_a["Threshold"]]["Ball"]
-                    b_bias = merged_b[merged_b["Average Proportion"] > merged_b["Threshold"]]["Ball"]
-                    common_positive = set(a_bias).intersection(set(b_bias))
-                    if common_positive:
-                        results.append(f"**{match_p1} vs {match_p2}** - Positive bias on: {', '.join(common_positive)}")
+            one_year_start = pd.Timestamp.today().normalize() - pd.Timedelta(days=365)
+            try:
+                matchups = get_upcoming_matchups_from_event(selected_event, selected_round)
+            except Exception as e:
+                st.error(f"Error scraping matchups: {e}")
+                matchups = []
+            matched_names = fuzzy_match_names([name for matchup in matchups for name in matchup], player_list)
+            player_stats = get_all_player_stats(game_df, one_year_start)
+            color_names = np.array(color_list)
+            # One byte per player: bit k is set when colour k is above its threshold
+            bias_bits = np.packbits(player_stats.to_numpy() > st.session_state.thresholds, axis=1, bitorder="little")
+            pairs = [(p1, p2) for p1, p2 in zip(matched_names[::2], matched_names[1::2]) if p1 and p2]
+            a_idx = player_stats.index.get_indexer([p1 for p1, _ in pairs])
+            b_idx = player_stats.index.get_indexer([p2 for _, p2 in pairs])
+            common_bits = bias_bits[a_idx] & bias_bits[b_idx]
+            survivors = np.flatnonzero(common_bits[:, 0])
+            common_flags = np.unpackbits(common_bits[survivors], axis=1, count=len(color_list), bitorder="little").astype(bool)
+            results = [
+                f"**{pairs[i][0]} vs {pairs[i][1]}** - Positive bias on: {', '.join(color_names[flags])}"
+                for i, flags in zip(survivors, common_flags)
+            ]
             st.session_state.matchup_results = results
 
     if st.session_state.matchup_results:
@@ -209,8 +144,7 @@ if uploaded_file:
         st.info("No matchups with both players showing positive bias on any color.")
 
     st.divider()
-    st.file_uploader("Upload a new Excel file", type=["xlsx"], key="new_upload")
-else:
-    uploaded_file = st.file_uploader("Upload the Excel file", type=["xlsx"], key="initial_upload")
-    if uploaded_file:
-        st.session_state.uploaded_file = uploaded_file
+    if st.button("Upload different file"):
+        st.session_state.uploaded_file = None
+        st.session_state.matchup_results = None
+        st.rerun()